@@ -16,9 +16,12 @@
 #
 #  --------------------------------------------------------------------------------------------------------------------
 
+import functools
+import itertools
+import os
 import sys
 
-from random import randint
+from concurrent.futures import ThreadPoolExecutor
 
 import provider
 
@@ -26,7 +29,17 @@ import executor
 import network
 
 from utils import SeedIds
-from utils import random_text
+from utils import random_bytes
+
+# Source of ICMP identifiers, started at the process id so concurrent processes rarely collide.
+_identifiers = itertools.count(os.getpid())
+
+
+@functools.lru_cache(maxsize=256)
+def _default_payload(size):
+    """Returns a random payload of the specified size, generated once and reused by every ping of that size."""
+
+    return random_bytes(size)
 
 
 class PingCommand:
@@ -83,37 +96,84 @@ class PingCommand:
     def run(self):
         """Pings a remote host and handles the responses."""
 
-        payload_provider = provider.Repeat(b'', 0)
+        self.__prepare()
+
+        return self.__ping(self.destination)
+
+    def run_many(self, destinations, max_workers=512):
+        """Pings several remote hosts concurrently and returns their responses by destination.
+
+        A host that cannot be pinged, for instance because its name does not resolve, gets the error raised for it
+        instead of its responses, so it does not discard the responses of the others."""
+
+        # Each host is pinged once, even if it is given more than once.
+        destinations = list(dict.fromkeys(destinations))
+        if not destinations:
+            return {}
+
+        self.__prepare()
+
+        # Each host is pinged on its own thread, with its own socket and identifier.
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(destinations))) as pool:
+            # Verbose output is written once per host, so the lines of concurrent hosts do not interleave.
+            futures = {destination: pool.submit(self.__ping, destination, True) for destination in destinations}
+
+        results = {}
+        for destination, future in futures.items():
+            try:
+                results[destination] = future.result()
+            except (RuntimeError, OSError) as error:
+                results[destination] = error
+
+        return results
+
+    def __prepare(self):
+        """Sets the payload and socket options shared by every host pinged by this command."""
 
         if self.sweep_start and self.sweep_end and self.sweep_end >= self.sweep_start:
             if not self.payload:
-                self.payload = random_text(self.sweep_start)
-            payload_provider = provider.Sweep(self.payload, self.sweep_start, self.sweep_end)
+                # Generated at the largest size, so the sweep only takes prefixes of it.
+                self.payload = _default_payload(self.sweep_end)
         elif self.size and self.size > 0:
             if not self.payload:
-                self.payload = random_text(self.size)
-            payload_provider = provider.Repeat(self.payload, self.count)
+                self.payload = _default_payload(self.size)
 
         # Set the Don't Fragment bit.
         if self.dont_fragment:
-            self.options = network.SocketInterface.dont_fragment
+            self.options = network.DONT_FRAGMENT_OPT
 
-        while True:
-            seed_id = randint(0x1, 0xFFFF)
-            if seed_id not in self.seed_identifiers.ids:
-                self.seed_identifiers.ids.append(seed_id)
-                break
+    def __payload_provider(self):
+        """Creates a provider of the payloads to send, so each pinged host iterates its own."""
+
+        if self.sweep_start and self.sweep_end and self.sweep_end >= self.sweep_start:
+            return provider.Sweep(self.payload, self.sweep_start, self.sweep_end)
+        elif self.size and self.size > 0:
+            return provider.Repeat(self.payload, self.count)
+
+        return provider.Repeat(b'', 0)
 
-        communicator = executor.Communicator(self.destination,
-                                             payload_provider,
-                                             self.timeout,
-                                             socket_options=self.options,
-                                             verbose=self.verbose,
-                                             output=self.output,
-                                             seed_id=seed_id)
+    def __ping(self, destination, buffered_output=False):
+        """Pings one remote host and returns its responses."""
 
-        communicator.run(match_payloads=self.match)
+        while True:
+            # Keep the identifier in 16 bits, skipping zero and those still in use after a wrap around.
+            seed_id = next(_identifiers) & 0xFFFF
+            if seed_id and seed_id not in self.seed_identifiers:
+                self.seed_identifiers.add(seed_id)
+                break
 
-        self.seed_identifiers.ids.remove(seed_id)
+        try:
+            communicator = executor.Communicator(destination,
+                                                 self.__payload_provider(),
+                                                 self.timeout,
+                                                 socket_options=self.options,
+                                                 verbose=self.verbose,
+                                                 output=self.output,
+                                                 seed_id=seed_id,
+                                                 buffered_output=buffered_output)
+
+            communicator.run(match_payloads=self.match)
+        finally:
+            self.seed_identifiers.discard(seed_id)
 
         return communicator.responses
@@ -18,10 +18,14 @@
 
 """Components for sending messages and handling responses."""
 import os
+import socket
 import sys
 
+from models import ICMP_HEADER_LENGTH
 from models import ICMPPacket
 from models import Types
+from models import TypesV6
+from models import build_echo_request
 
 from network import SocketInterface
 
@@ -29,16 +33,63 @@ from utils import SuccessRequest
 from utils import represent_seconds_in_milliseconds
 
 
+# Error carried by an ICMPPacket response, keyed by its type and code.
+_ICMP_ERRORS = {
+    # Echo Reply, response OK - no error
+    (0, 0): None,
+    # Destination unreachable, with more details based on the message code
+    (3, 0): 'Network Unreachable',
+    (3, 1): 'Host Unreachable',
+    (3, 2): 'Protocol Unreachable',
+    (3, 3): 'Port Unreachable',
+    (3, 4): 'Fragmentation Required',
+    (3, 5): 'Source Route Failed',
+    (3, 6): 'Network Unknown',
+    (3, 7): 'Host Unknown',
+    (3, 8): 'Source Host Isolated',
+    (3, 9): 'Communication with Destination Network is Administratively Prohibited',
+    (3, 10): 'Communication with Destination Host is Administratively Prohibited',
+    (3, 11): 'Network Unreachable for ToS',
+    (3, 12): 'Host Unreachable for ToS',
+    (3, 13): 'Communication Administratively Prohibited',
+    (3, 14): 'Host Precedence Violation',
+    (3, 15): 'Precedence Cutoff in Effect',
+}
+
+# Error carried by an ICMPv6 response, keyed by its type and code.
+_ICMPV6_ERRORS = {
+    # Echo Reply, response OK - no error
+    (129, 0): None,
+    # Destination unreachable, with more details based on the message code
+    (1, 0): 'No Route to Destination',
+    (1, 1): 'Communication with Destination Administratively Prohibited',
+    (1, 2): 'Beyond Scope of Source Address',
+    (1, 3): 'Address Unreachable',
+    (1, 4): 'Port Unreachable',
+    (1, 5): 'Source Address Failed Ingress/Egress Policy',
+    (1, 6): 'Reject Route to Destination',
+    (2, 0): 'Packet Too Big',
+    (3, 0): 'Hop Limit Exceeded in Transit',
+    (3, 1): 'Fragment Reassembly Time Exceeded',
+}
+
+
 class Message:
     """Represents an ICMPPacket message with destination socket."""
 
-    def __init__(self, destination, packet, source):
+    def __init__(self, destination, packet, source, packet_size=None):
         """Creates a message that may be sent, or used to represent a response."""
 
         self.__destination = destination
         self.__packet = packet
         self.__source = source
 
+        # Received messages already know their size, others take it from the packed packet.
+        if packet_size is None:
+            packet_size = len(packet.packet)
+
+        self.__packet_size = packet_size
+
     @property
     def destination(self):
         return self.__destination
@@ -51,6 +102,12 @@ class Message:
     def source(self):
         return self.__source
 
+    @property
+    def packet_size(self):
+        """Length of the ICMPPacket, header included."""
+
+        return self.__packet_size
+
     def send(self, source_socket):
         """Places the message on a socket."""
 
@@ -66,6 +123,9 @@ class Response:
         self.__message = message
         self.__time_elapsed = time_elapsed
 
+        # A response never changes, so its error is identified only once.
+        self.__error_message = self.__identify_error(message)
+
     def __repr__(self):
         """Return repr(self)."""
 
@@ -73,7 +133,7 @@ class Response:
             return 'Request timed out.'
         elif self.success:
             return f'Reply from {self.message.source} ' \
-                   f'bytes={len(self.message.packet.packet)} ' \
+                   f'bytes={self.message.packet_size} ' \
                    f'time={self.time_elapsed_ms}ms'
         else:
             return f'{self.error_message} from {self.message.source} in {self.time_elapsed_ms}ms'
@@ -88,7 +148,7 @@ class Response:
 
     @property
     def success(self):
-        return self.error_message is None
+        return self.__error_message is None
 
     @property
     def time_elapsed_ms(self):
@@ -96,62 +156,60 @@ class Response:
 
     @property
     def error_message(self):
-        if self.message is None:
+        return self.__error_message
+
+    @staticmethod
+    def __identify_error(message):
+        """Returns the error carried by the message, or None if it is a successful reply."""
+
+        if message is None:
             return 'No response'
+
+        message_type = message.packet.message_type
+        message_code = message.packet.message_code
+
+        if message.packet.family == socket.AF_INET6:
+            errors = _ICMPV6_ERRORS
+            unreachable_type = TypesV6.DestinationUnreachable.type_id
         else:
-            if self.message.packet.message_type == 0 and self.message.packet.message_code == 0:
-                # Echo Reply, response OK - no error
-                return None
-            elif self.message.packet.message_type == 3:
-                # Destination unreachable, returning more details based on __message code
-                unreachable_messages = [
-                    'Network Unreachable',
-                    'Host Unreachable',
-                    'Protocol Unreachable',
-                    'Port Unreachable',
-                    'Fragmentation Required',
-                    'Source Route Failed',
-                    'Network Unknown',
-                    'Host Unknown',
-                    'Source Host Isolated',
-                    'Communication with Destination Network is Administratively Prohibited',
-                    'Communication with Destination Host is Administratively Prohibited',
-                    'Network Unreachable for ToS',
-                    'Host Unreachable for ToS',
-                    'Communication Administratively Prohibited',
-                    'Host Precedence Violation',
-                    'Precedence Cutoff in Effect'
-                ]
-
-                try:
-                    return unreachable_messages[self.message.packet.message_code]
-                except IndexError:
-                    # Should never generate IndexError, this serves as additional protection
-                    return 'Unreachable'
-
-        # Error was not identified
-        return 'Network Error'
+            errors = _ICMP_ERRORS
+            unreachable_type = Types.DestinationUnreachable.type_id
+
+        try:
+            return errors[(message_type, message_code)]
+        except KeyError:
+            if message_type == unreachable_type:
+                # Destination unreachable with an unassigned code.
+                return 'Unreachable'
+
+            # Error was not identified
+            return 'Network Error'
 
 
 class ResponseList:
     """Represents a series of ICMPPacket responses."""
 
-    def __init__(self, initial_set=None, verbose=False, output=sys.stdout):
-        """Creates a ResponseList with initial data if available."""
+    def __init__(self, initial_set=None, verbose=False, output=sys.stdout, buffered=False):
+        """Creates a ResponseList with initial data if available.
+
+        With buffered set, the verbose output is held until `flush_output` instead of written per response."""
 
         if initial_set is None:
             initial_set = []
 
         self.__responses = []
+        self.__success_count = 0
+        self.__fail_count = 0
         self.clear_responses()
         self.verbose = verbose
         self.output = output
+        self.buffered = buffered
+        self.__pending_output = []
 
         # Round Trip Time
         self.__rtt_avg = 0
         self.__rtt_min = 0
         self.__rtt_max = 0
-        self.__packets_lost = 0
 
         for response in initial_set:
             self.append(response)
@@ -165,20 +223,21 @@ class ResponseList:
         """Check success state of the request."""
 
         result = False
-        success_list = [response.success for response in self.__responses]
 
         if option == SuccessRequest.one:
-            result = True in success_list
+            result = self.__success_count > 0
         elif option == SuccessRequest.most:
-            result = success_list.count(True) / len(success_list) > .5
+            result = 2 * self.__success_count > len(self)
         elif option == SuccessRequest.all:
-            result = False not in success_list
+            result = self.__fail_count == 0
 
         return result
 
     def clear_responses(self):
         """Clears stored responses."""
         self.__responses = []
+        self.__success_count = 0
+        self.__fail_count = 0
 
     def append(self, response):
         """Adds value to stored responses."""
@@ -197,14 +256,29 @@ class ResponseList:
             if response.time_elapsed < self.__rtt_min:
                 self.__rtt_min = response.time_elapsed
 
-        self.__packets_lost = self.__packets_lost + (0 if response.success else 1 - self.__packets_lost) / len(self)
+        if response.success:
+            self.__success_count += 1
+        else:
+            self.__fail_count += 1
 
         if self.verbose:
-            print(response, file=self.output)
+            if self.buffered:
+                self.__pending_output.append(f'{response}\n')
+            else:
+                self.output.write(f'{response}\n')
+
+    def flush_output(self):
+        """Writes the verbose output held back by a buffered ResponseList."""
+
+        if self.__pending_output:
+            self.output.writelines(self.__pending_output)
+            self.__pending_output = []
 
     @property
     def packets_lost(self):
-        return self.__packets_lost
+        """Number of requests without a successful response."""
+
+        return self.__fail_count
 
     @property
     def rtt_min_ms(self):
@@ -235,13 +309,22 @@ class Communicator:
                  socket_options=(),
                  seed_id=None,
                  verbose=False,
-                 output=sys.stdout):
+                 output=sys.stdout,
+                 buffered_output=False):
         """Creates an instance that can handle communication with the target_address device."""
 
         self.socket = SocketInterface(target, 'icmp', socket_options=socket_options)
+
+        # ICMPv6 has its own Echo Request type, to be told apart from the replies.
+        if self.socket.family == socket.AF_INET6:
+            self.echo_request_type = TypesV6.EchoRequest.type_id
+            self.echo_reply_type = TypesV6.EchoReply.type_id
+        else:
+            self.echo_request_type = Types.EchoRequest.type_id
+            self.echo_reply_type = Types.EchoReply.type_id
         self.provider = payload_provider
         self.timeout = timeout
-        self.responses = ResponseList(verbose=verbose, output=output)
+        self.responses = ResponseList(verbose=verbose, output=output, buffered=buffered_output)
 
         # The seed ID must be unique per thread.
         self.seed_id = seed_id
@@ -251,33 +334,44 @@ class Communicator:
     def send_ping(self, packet_id, sequence_number, payload):
         """Sends one ICMPPacket Echo Request on the socket."""
 
-        icmp_packet = ICMPPacket(Types.EchoRequest,
-                                 payload=payload,
-                                 identifier=packet_id,
-                                 sequence_number=sequence_number)
-        self.socket.send_packet(icmp_packet.packet)
+        raw_packet = build_echo_request(packet_id, sequence_number, payload, family=self.socket.family)
+        self.socket.send_packet(raw_packet)
+
+        return raw_packet[ICMP_HEADER_LENGTH:].tobytes()
 
-        return icmp_packet.payload
+    def listen_for(self, packet_id, timeout, payload_pattern=None, sequence_number=None):
+        """Listens for a packet of a given identifier for a given timeout.
 
-    def listen_for(self, packet_id, timeout, payload_pattern=None):
-        """Listens for a packet of a given identifier for a given timeout."""
+        When the sequence number is given, Echo Replies to any other request are ignored."""
 
         time_left = timeout
-        response = ICMPPacket()
         while time_left > 0:
             raw_received, address, time_left = self.socket.receive_packet(time_left)
 
             if raw_received != b'':
-                response.unpack(raw_received)
+                # Read type and identifier straight from the raw bytes, so packets meant for
+                # someone else are dropped without building an ICMPPacket for them.
+                header_length = ICMPPacket.ip_header_length(raw_received, self.socket.family)
+                message_type = raw_received[header_length]
+                identifier = int.from_bytes(raw_received[header_length + 4:header_length + 6], 'big')
+
+                # An Echo Reply carries the sequence number of its request, so replies to earlier requests are skipped.
+                if message_type == self.echo_reply_type and sequence_number is not None:
+                    received_sequence = int.from_bytes(raw_received[header_length + 6:header_length + 8], 'big')
+                    if received_sequence != sequence_number:
+                        continue
+
+                if identifier == packet_id and message_type != self.echo_request_type:
+                    response = ICMPPacket.generate_from_raw(raw_received, self.socket.family)
 
-                if response.identifier == packet_id and response.message_type != Types.EchoRequest.type_id:
                     if payload_pattern is None:
                         payload_matched = True
                     else:
                         payload_matched = (payload_pattern == response.payload)
 
                     if payload_matched:
-                        return Response(Message('', response, address[0]), (timeout - time_left))
+                        return Response(Message('', response, address[0], len(raw_received) - header_length),
+                                        (timeout - time_left))
 
         return Response(None, timeout)
 
@@ -288,16 +382,35 @@ class Communicator:
 
         identifier = self.seed_id
         sequence = 1
+        raw_packet = None
+        last_payload = None
         for payload in self.provider:
-            payload_bytes_sent = self.send_ping(identifier, sequence, payload)
+            # Only an immutable payload is known to be unchanged when the same object is given again.
+            if raw_packet is None or payload is not last_payload or not isinstance(payload, bytes):
+                # Every packet is packed into the same buffer, which only grows for larger payloads.
+                raw_packet = build_echo_request(identifier,
+                                                sequence,
+                                                payload,
+                                                None if raw_packet is None else raw_packet.obj,
+                                                self.socket.family,
+                                                getattr(self.provider, 'partial_checksum', None))
+                payload_bytes_sent = raw_packet[ICMP_HEADER_LENGTH:]
+                last_payload = payload
+            else:
+                # The same payload again only needs its sequence number and checksum patched.
+                ICMPPacket.update_sequence_number(raw_packet, sequence)
+
+            self.socket.send_packet(raw_packet)
 
             if not match_payloads:
-                self.responses.append(self.listen_for(identifier, self.timeout))
+                self.responses.append(self.listen_for(identifier, self.timeout, sequence_number=sequence))
             else:
-                self.responses.append(self.listen_for(identifier, self.timeout, payload_bytes_sent))
+                self.responses.append(self.listen_for(identifier, self.timeout, payload_bytes_sent, sequence))
 
             sequence = self.increase_seq(sequence)
 
+        self.responses.flush_output()
+
     @staticmethod
     def increase_seq(sequence_number):
         """Increases an ICMPPacket sequence number and reset if it gets bigger than 2 bytes."""
@@ -19,9 +19,13 @@
 """A base Internet Control Message Protocol - ICMPPacket packet (RFC 792)."""
 
 import os
-import struct
+import socket
 
-from utils import ICMPData
+from utils import ICMP_STRUCT
+from utils import ones_complement_sum
+
+# Header is type (8), code (8), checksum (16), identifier (16), sequence (16).
+ICMP_HEADER_LENGTH = ICMP_STRUCT.size
 
 
 class ICMPBaseType:
@@ -126,6 +130,42 @@ class Types(ICMPBaseType):
         INFORMATION_REQUEST = (type_id, 30)
 
 
+class TypesV6(ICMPBaseType):
+    """Represents an ICMPv6 type, as combination of type and code (RFC 4443)"""
+    class DestinationUnreachable(ICMPBaseType):
+        type_id = 1
+        NO_ROUTE = (type_id, 0)
+        ADMINISTRATIVELY_PROHIBITED = (type_id, 1)
+        BEYOND_SCOPE = (type_id, 2)
+        ADDRESS_UNREACHABLE = (type_id, 3)
+        PORT_UNREACHABLE = (type_id, 4)
+        SOURCE_ADDRESS_FAILED_POLICY = (type_id, 5)
+        REJECT_ROUTE = (type_id, 6)
+
+    class PacketTooBig(ICMPBaseType):
+        type_id = 2
+        PACKET_TOO_BIG = (type_id, 0)
+
+    class TimeExceeded(ICMPBaseType):
+        type_id = 3
+        HOP_LIMIT_EXCEEDED = (type_id, 0)
+        FRAGMENT_REASSEMBLY_TIME_EXCEEDED = (type_id, 1)
+
+    class ParameterProblem(ICMPBaseType):
+        type_id = 4
+        ERRONEOUS_HEADER_FIELD = (type_id, 0)
+        UNRECOGNIZED_NEXT_HEADER = (type_id, 1)
+        UNRECOGNIZED_OPTION = (type_id, 2)
+
+    class EchoRequest(ICMPBaseType):
+        type_id = 128
+        ECHO_REQUEST = (type_id, 0)
+
+    class EchoReply(ICMPBaseType):
+        type_id = 129
+        ECHO_REPLY = (type_id, 0)
+
+
 class PacketBase:
     @staticmethod
     def checksum(message):
@@ -133,26 +173,8 @@ class PacketBase:
 
         Divides the data in 16-bits chunks, then make their 1's complement sum."""
 
-        amount = 0
-
-        for i in range(0, len(message) - 1, 2):
-            # Sum 16 bits chunks together.
-            amount += ((message[i] << 8) + message[i + 1])
-
-        # If length is odd:
-        if len(message) % 2:
-            # Sum the last byte plus one empty byte of padding.
-            amount += (message[len(message) - 1] << 8)
-
-        # Add carry on the right until fits in 16 bits.
-        while amount >> 16:
-            amount = (amount & 0xFFFF) + (amount >> 16)
-
         # Performs the one complement.
-        check = ~amount
-
-        # Swap bytes
-        return ((check << 8) & 0xFF00) | ((check >> 8) & 0x00FF)
+        return ~ones_complement_sum(message) & 0xFFFF
 
 
 class ICMPPacket(PacketBase):
@@ -161,7 +183,8 @@ class ICMPPacket(PacketBase):
                  payload=None,
                  identifier=None,
                  sequence_number=1,
-                 received_checksum=None):
+                 received_checksum=None,
+                 family=socket.AF_INET):
         """Creates an ICMPPacket packet."""
 
         self.message_code = 0
@@ -189,37 +212,55 @@ class ICMPPacket(PacketBase):
         self.sequence_number = sequence_number
         self.received_checksum = received_checksum
 
-    def __header(self, checksum=0):
-        """The raw ICMPPacket header.
-
-        Set type, code, and version for the packet.
-
-        Header is type (8), code (8), checksum (16), identifier (16), sequence (16)."""
+        # Address family the packet is carried over, AF_INET for ICMP or AF_INET6 for ICMPv6.
+        self.family = family
 
-        # header = struct.pack('bbHHh', ICMP_ECHO_REQUEST, 0, 0, identifier, 1)
-        return struct.pack(ICMPData.ICMP_STRUCTURE_FMT.value,
-                           self.message_type,
-                           self.message_code,
-                           checksum,
-                           self.identifier,
-                           self.sequence_number)
+        # Raw packet built from the fields it was packed with, reused while they are unchanged.
+        self.__packed = None
+        self.__packed_fields = None
 
-    def unpack(self, raw):
+    def unpack(self, raw, family=socket.AF_INET):
         """Unpacks a raw packet and stores it in this object."""
 
         self.message_type, \
             self.message_code, \
             self.received_checksum, \
             self.identifier, \
-            sequence = struct.unpack(ICMPData.ICMP_STRUCTURE_FMT.value, raw[20:28])
+            self.sequence_number, \
+            self.payload = parse_icmp(raw, family)
 
-        self.payload = raw[28:]
+        self.family = family
+
+    @staticmethod
+    def ip_header_length(raw, family=socket.AF_INET):
+        """Length in bytes of the IP header that precedes the ICMPPacket in a raw packet.
+
+        IPv4 raw sockets keep the header, whose length is set in its IHL field; IPv6 raw sockets strip it."""
+
+        if family == socket.AF_INET6:
+            return 0
+
+        return (raw[0] & 0x0F) * 4
 
     @property
     def packet(self):
-        """The raw packet with header, ready to be sent from a socket"""
+        """The raw packet with header, ready to be sent from a socket.
+
+        It is packed again only when the fields change."""
+
+        # A payload that can be changed in place is taken as it is now, so changing it invalidates the packed packet.
+        payload = self.payload
+        if not isinstance(payload, bytes):
+            payload = bytes(payload)
 
-        return self.__header(checksum=self.expected_checksum) + self.payload
+        fields = (self.message_type, self.message_code, self.identifier, self.sequence_number, payload)
+
+        if fields != self.__packed_fields:
+            # Immutable bytes, so a packet handed out earlier does not change along with the fields.
+            self.__packed = _pack_icmp(None, *fields).tobytes()
+            self.__packed_fields = fields
+
+        return self.__packed
 
     @property
     def is_valid(self):
@@ -233,19 +274,91 @@ class ICMPPacket(PacketBase):
     def expected_checksum(self):
         """The checksum expected for this packet, calculated with checksum field set to 0."""
 
-        return self.checksum(self.__header() + self.payload)
+        return int.from_bytes(self.packet[2:4], 'big')
 
     @property
     def header_length(self):
         """Length of the ICMPPacket header."""
 
-        return len(self.__header())
+        return ICMP_HEADER_LENGTH
+
+    @staticmethod
+    def update_sequence_number(raw, sequence_number):
+        """Rewrites the sequence number of a raw packet in place, updating its checksum as in RFC 1624.
+
+        Header fields are in network byte order."""
+
+        old_checksum = int.from_bytes(raw[2:4], 'big')
+        old_sequence_number = int.from_bytes(raw[6:8], 'big')
+
+        raw[6:8] = sequence_number.to_bytes(2, 'big')
+
+        # HC' = ~(~HC + ~m + m')
+        amount = (~old_checksum & 0xFFFF) + (~old_sequence_number & 0xFFFF) + sequence_number
+
+        # Add carry on the right until fits in 16 bits.
+        while amount >> 16:
+            amount = (amount & 0xFFFF) + (amount >> 16)
+
+        raw[2:4] = (~amount & 0xFFFF).to_bytes(2, 'big')
 
     @staticmethod
-    def generate_from_raw(raw):
+    def generate_from_raw(raw, family=socket.AF_INET):
         """Creates a new ICMPPacket representation from the raw bytes."""
 
         packet = ICMPPacket()
-        packet.unpack(raw)
+        packet.unpack(raw, family)
 
         return packet
+
+
+def _pack_icmp(buffer, message_type, message_code, identifier, sequence_number, payload, payload_sum=None):
+    """Packs the header and payload of an ICMPPacket, with its checksum, at the start of the buffer.
+
+    Returns a view over the packed bytes. A new buffer is allocated if none is given or it is too small.
+    When the 1's complement sum of the payload is given, only the header is summed for the checksum."""
+
+    length = ICMP_HEADER_LENGTH + len(payload)
+    if buffer is None or len(buffer) < length:
+        buffer = bytearray(length)
+
+    raw = memoryview(buffer)[:length]
+    ICMP_STRUCT.pack_into(raw, 0, message_type, message_code, 0, identifier, sequence_number)
+    raw[ICMP_HEADER_LENGTH:] = payload
+
+    if payload_sum is None:
+        checksum = PacketBase.checksum(raw)
+    else:
+        checksum = ~ones_complement_sum(raw[:ICMP_HEADER_LENGTH], payload_sum) & 0xFFFF
+
+    # Patch the checksum in place instead of packing the header a second time.
+    raw[2:4] = checksum.to_bytes(2, 'big')
+
+    return raw
+
+
+def build_echo_request(identifier, sequence_number, payload, buffer=None, family=socket.AF_INET, payload_sum=None):
+    """Creates a raw Echo Request, ready to be sent from a socket, without an ICMPPacket object.
+
+    The packet is packed into the buffer when it is large enough, so a sender can reuse one buffer for every packet.
+    A payload_sum known in advance, as given by a payload provider, saves summing the payload again.
+    For ICMPv6 the kernel replaces the checksum with one that covers the IPv6 pseudo-header."""
+
+    if isinstance(payload, str):
+        payload = bytes(payload, 'utf8')
+
+    if family == socket.AF_INET6:
+        message_type = TypesV6.EchoRequest.type_id
+    else:
+        message_type = Types.EchoRequest.type_id
+
+    # Prevent identifiers bigger than 16 bits.
+    return _pack_icmp(buffer, message_type, 0, identifier & 0xFFFF, sequence_number, payload, payload_sum)
+
+
+def parse_icmp(raw, family=socket.AF_INET):
+    """Splits a raw packet into ICMPPacket type, code, checksum, identifier, sequence number and payload."""
+
+    header_length = ICMPPacket.ip_header_length(raw, family)
+
+    return ICMP_STRUCT.unpack_from(raw, header_length) + (raw[header_length + ICMP_HEADER_LENGTH:],)
@@ -18,31 +18,163 @@
 
 """This module provides access to the BSD socket interface."""
 
-import select
 import socket
+import threading
 import time
 
+# Specifies that datagrams sent on the socket cannot be fragmented.
+#
+# Datagrams require fragmentation when their size exceeds the Maximum Transfer Unit (MTU) of the transmission
+# medium. Datagrams may be fragmented by the sending host (all Internet Protocol versions) or an intermediate
+# router (Internet Protocol Version 4 only). If a datagram must be fragmented, and the DontFragment option is
+# set, the datagram is discarded, and an Internet Control Message Protocol (ICMPPacket) error message is
+# sent back to the sender of the datagram.
+#
+# Older Python versions do not export the Linux constants, so their values are given as fallback.
+DONT_FRAGMENT_OPT = (socket.SOL_IP,
+                     getattr(socket, 'IP_MTU_DISCOVER', 10),
+                     getattr(socket, 'IP_PMTUDISC_DO', 2))
+
+# The same option for sockets sending over IPv6.
+DONT_FRAGMENT_OPT_V6 = (socket.IPPROTO_IPV6,
+                        getattr(socket, 'IPV6_MTU_DISCOVER', 23),
+                        getattr(socket, 'IPV6_PMTUDISC_DO', 2))
+
+# Protocols and socket options replaced by their own IPv6 version when the destination is an IPv6 address.
+_IPV6_PROTOCOLS = {'icmp': 'ipv6-icmp'}
+_IPV6_SOCKET_OPTIONS = {DONT_FRAGMENT_OPT: DONT_FRAGMENT_OPT_V6}
+
+# Seconds during which a resolved address is reused before asking the resolver again.
+RESOLVER_CACHE_TTL = 15 * 60
+
+# Most host names kept by the resolver cache, the oldest resolution being dropped first.
+RESOLVER_CACHE_MAXSIZE = 1024
+
+_resolver_cache = {}
+_resolver_cache_lock = threading.Lock()
+
+
+def _resolve(host):
+    """Translate a host name to its address family and socket address, reusing recent resolutions.
+
+    Both IPv4 and IPv6 addresses are looked up, and the first one in the resolver's preferred order is used."""
+
+    now = time.monotonic()
+
+    with _resolver_cache_lock:
+        cached = _resolver_cache.get(host)
+
+    if cached is not None and cached[1] > now:
+        return cached[0]
+
+    family, _, _, _, address = socket.getaddrinfo(host, None, socket.AF_UNSPEC, socket.SOCK_RAW, 0,
+                                                   socket.AI_ADDRCONFIG)[0]
+    address = (family, address)
+
+    with _resolver_cache_lock:
+        # Re-inserted at the end, so the cache stays ordered from the oldest resolution to the newest.
+        _resolver_cache.pop(host, None)
+
+        if len(_resolver_cache) >= RESOLVER_CACHE_MAXSIZE:
+            for expired_host in [name for name, (_, expiry) in _resolver_cache.items() if expiry <= now]:
+                del _resolver_cache[expired_host]
+
+        while len(_resolver_cache) >= RESOLVER_CACHE_MAXSIZE:
+            del _resolver_cache[next(iter(_resolver_cache))]
+
+        _resolver_cache[host] = (address, now + RESOLVER_CACHE_TTL)
+
+    return address
+
+
+class _SocketPool:
+    """Keeps idle raw sockets open so later SocketInterface instances can reuse them.
+
+    An idle raw socket still receives a copy of every inbound packet of its protocol, so only a few are kept and
+    their queue is drained before they are handed out again."""
+
+    def __init__(self, max_idle=8):
+        self.__idle = {}
+        self.__lock = threading.Lock()
+        self.__max_idle = max_idle
+
+    def acquire(self, family, protocol, socket_options=()):
+        """Return an open socket for the family, protocol and options, creating one only if none is idle."""
+
+        key = (family, protocol, socket_options)
+
+        with self.__lock:
+            idle = self.__idle.get(key)
+            reused_socket = idle.pop() if idle else None
+
+        if reused_socket is not None:
+            self.__drain(reused_socket)
+            return reused_socket
+
+        new_socket = socket.socket(family, socket.SOCK_RAW, protocol)
+
+        if socket_options:
+            new_socket.setsockopt(*socket_options)
+
+        return new_socket
+
+    @staticmethod
+    def __drain(idle_socket):
+        """Discard the packets queued while the socket was idle, so none is taken as a reply to a new request."""
+
+        idle_socket.setblocking(False)
+
+        try:
+            while True:
+                idle_socket.recv(65535)
+        except BlockingIOError:
+            pass
+
+        idle_socket.setblocking(True)
+
+    def release(self, family, protocol, socket_options, used_socket):
+        """Hand a socket back to the pool, closing it if enough sockets are already idle."""
+
+        key = (family, protocol, socket_options)
+
+        with self.__lock:
+            idle = self.__idle.setdefault(key, [])
+            if len(idle) < self.__max_idle:
+                idle.append(used_socket)
+                return
+
+        used_socket.close()
+
+
+_socket_pool = _SocketPool()
+
 
 class SocketInterface:
     """Implement of the BSD socket interface."""
 
+    __slots__ = ('__socket', '__family', '__address', '__protocol', '__socket_options', '__buffer_size')
+
     def __init__(self, destination, protocol, socket_options=(), buffer_size=2048):
         """Creates a network socket to exchange messages."""
 
         self.__socket = None
 
         try:
-            self.__destination = socket.gethostbyname(destination)
+            self.__family, self.__address = _resolve(destination)
         except socket.gaierror as error:
             raise RuntimeError(f'Cannot resolve the address {destination}, try verify your DNS or host file.\n{error}')
 
+        socket_options = tuple(socket_options)
+
+        if self.__family == socket.AF_INET6:
+            protocol = _IPV6_PROTOCOLS.get(protocol, protocol)
+            socket_options = _IPV6_SOCKET_OPTIONS.get(socket_options, socket_options)
+
         self.__protocol = socket.getprotobyname(protocol)
+        self.__socket_options = socket_options
         self.__buffer_size = buffer_size
 
-        self.__socket = socket.socket(socket.AF_INET, socket.SOCK_RAW, self.protocol)
-
-        if socket_options:
-            self.socket.setsockopt(*socket_options)
+        self.__socket = _socket_pool.acquire(self.family, self.protocol, self.__socket_options)
 
     def __enter__(self):
         """Return this object."""
@@ -60,23 +192,19 @@ class SocketInterface:
     def close_socket(self):
         """Safe socket cleanup after all references to the object have been deleted."""
 
-        try:
-            if hasattr(self, 'socket') and not self.is_closed:
-                self.socket.close()
-                self.socket = None
-        except AttributeError:
-            raise AttributeError('Attribute error because of failed socket init. Make sure you have the root '
-                                 'privilege. This error may also be caused from DNS resolution problems.')
+        if self.__socket is not None:
+            _socket_pool.release(self.__family, self.__protocol, self.__socket_options, self.__socket)
+            self.__socket = None
 
     @property
-    def is_closed(self):
-        """Indicate whether the socket is closed."""
-
-        return self.socket is None
+    def destination(self):
+        return self.__address[0]
 
     @property
-    def destination(self):
-        return self.__destination
+    def family(self):
+        """Address family of the destination, either AF_INET or AF_INET6."""
+
+        return self.__family
 
     @property
     def buffer_size(self):
@@ -108,35 +236,20 @@ class SocketInterface:
     def send_packet(self, packet):
         """Sends a raw packet on the stream."""
 
-        self.socket.sendto(packet, (self.destination, 0))
+        self.socket.sendto(packet, self.__address)
 
     def receive_packet(self, timeout=2):
         """Listen for incoming packets until timeout."""
 
-        time_left = timeout
-        while time_left > 0:
-            start_time = time.perf_counter()
+        # Let the socket wait for the packet, changing its timeout only when a different one is asked.
+        if self.socket.gettimeout() != timeout:
+            self.socket.settimeout(timeout)
 
-            data_ready = select.select([self.socket], [], [], time_left)
-
-            time_elapse_in_select = time.perf_counter() - start_time
-            time_left -= time_elapse_in_select
-
-            if not data_ready[0]:
-                return b'', '', time_left
+        start_time = time.perf_counter()
 
+        try:
             packet_received, address = self.socket.recvfrom(self.buffer_size)
+        except socket.timeout:
+            return b'', '', 0
 
-            return packet_received, address, time_left
-
-    @property
-    def dont_fragment(self):
-        """Specifies whether sockets cannot be fragmented.
-
-        Datagrams require fragmentation when their size exceeds the Maximum Transfer Unit (MTU) of the transmission
-        medium. Datagrams may be fragmented by the sending host (all Internet Protocol versions) or an intermediate
-        router (Internet Protocol Version 4 only). If a datagram must be fragmented, and the DontFragment option is
-        set, the datagram is discarded, and an Internet Control Message Protocol (ICMPPacket) error message is
-        sent back to the sender of the datagram."""
-
-        return socket.SOL_IP, 10, 1
+        return packet_received, address, timeout - (time.perf_counter() - start_time)
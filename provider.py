@@ -18,76 +18,91 @@
 
 """Provide payload data for Internet Control Message Protocol (ICMP), with no header."""
 
+import itertools
 
-class PayloadProviderBase:
-    def __init__(self):
-        raise NotImplementedError('Cannot create instances of PayloadProviderBase')
+from abc import ABC
+from abc import abstractmethod
 
+from utils import ones_complement_sum
+
+
+class PayloadProviderBase(ABC):
+    __slots__ = ()
+
+    @abstractmethod
     def __iter__(self):
         """Implement iter(self)."""
 
         raise NotImplementedError()
 
-    def __next__(self):
-        """Implement next(self)."""
+    @property
+    def partial_checksum(self):
+        """The 1's complement sum of the payloads when they are all the same, otherwise None."""
 
-        raise NotImplementedError()
+        return None
 
 
 class List(PayloadProviderBase):
+    __slots__ = ('__payloads',)
+
     def __init__(self, payload_list):
         """Creates a provider of payloads from an existing list of payloads."""
 
         self.__payloads = payload_list
-        self.__counter = 0
 
     def __iter__(self):
         """Implement iter(self)."""
 
-        self.__counter = 0
-
-        return self
-
-    def __next__(self):
-        """Implement next(self)."""
+        return iter(self.__payloads)
 
-        if self.__counter < len(self.__payloads):
-            ret = self.__payloads[self.__counter]
-            self.__counter += 1
-            return ret
+    def __len__(self):
+        """Return len(self)."""
 
-        raise StopIteration
+        return len(self.__payloads)
 
 
 class Repeat(PayloadProviderBase):
+    __slots__ = ('pattern', 'count', '__partial_checksum')
+
     def __init__(self, pattern, count):
         """Creates a provider of many identical payloads."""
 
+        if isinstance(pattern, str):
+            pattern = bytes(pattern, 'utf8')
+        elif not isinstance(pattern, bytes):
+            # Copied once into an immutable buffer, so the payload shared by every packet cannot change under the
+            # sender, which packs it a single time and only patches the sequence number afterwards.
+            pattern = bytes(pattern)
+
         self.pattern = pattern
         self.count = count
-        self.__counter = 0
+
+        # Every payload is the same, so its share of the checksum is summed only once.
+        self.__partial_checksum = ones_complement_sum(pattern)
 
     def __iter__(self):
         """Implement iter(self)."""
 
-        self.__counter = 0
+        # Every iteration gets its own iterator, counted in C.
+        return itertools.repeat(self.pattern, self.count)
 
-        return self
+    def __len__(self):
+        """Return len(self)."""
 
-    def __next__(self):
-        """Implement next(self)."""
+        return max(self.count, 0)
 
-        if self.__counter < self.count:
-            self.__counter += 1
+    @property
+    def partial_checksum(self):
+        """The 1's complement sum of the repeated payload."""
 
-            return self.pattern
+        return self.__partial_checksum
 
-        raise StopIteration
 
+class _SweepBase(PayloadProviderBase):
+    __slots__ = ('pattern', 'start_size', 'end_size')
 
-class Sweep(PayloadProviderBase):
     def __init__(self, pattern, start_size, end_size):
-        """Creates a provider of payloads of increasing size."""
+        """Validates and stores the pattern and sizes shared by the sweeping providers."""
 
         if start_size > end_size:
             raise ValueError('end_size must be greater or equal than start_size')
@@ -95,30 +110,62 @@ class Sweep(PayloadProviderBase):
         if len(pattern) == 0:
             raise ValueError('pattern cannot be empty')
 
+        if isinstance(pattern, str):
+            pattern = bytes(pattern, 'utf8')
+        elif not isinstance(pattern, bytes):
+            # Copied once into an immutable buffer, so the payloads cannot change with the caller's pattern, nor
+            # the views over it keep the caller from resizing it.
+            pattern = bytes(pattern)
+
         self.pattern = pattern
         self.start_size = start_size
         self.end_size = end_size
 
-        # Extend the length of the pattern if needed
-        while not len(self.pattern) >= end_size:
-            self.pattern += pattern
+    def __len__(self):
+        """Return len(self)."""
+
+        return self.end_size - self.start_size + 1
 
-        self.__current_size = self.start_size
+
+class Sweep(_SweepBase):
+    __slots__ = ('__view',)
+
+    def __init__(self, pattern, start_size, end_size):
+        """Creates a provider of payloads of increasing size."""
+
+        super().__init__(pattern, start_size, end_size)
+
+        # Extend the length of the pattern if needed, repeating it in a single step.
+        pattern = self.pattern
+        repetitions = (end_size + len(pattern) - 1) // len(pattern)
+        if repetitions > 1:
+            self.pattern = pattern * repetitions
+
+        # Payloads are views over the extended pattern, so no size copies it.
+        self.__view = memoryview(self.pattern)
 
     def __iter__(self):
         """Implement iter(self)."""
 
-        self.__current_size = self.start_size
+        view = self.__view
+        for size in range(self.start_size, self.end_size + 1):
+            yield view[0:size]
+
+
+class StreamingSweep(_SweepBase):
+    __slots__ = ()
 
-        return self
+    def __init__(self, pattern, start_size, end_size):
+        """Creates a provider of payloads of increasing size, built one at a time.
 
-    def __next__(self):
-        """Implement next(self)."""
+        Yields the same payloads as Sweep without extending the pattern to end_size up front."""
 
-        if self.__current_size <= self.end_size:
-            ret = self.pattern[0:self.__current_size]
-            self.__current_size += 1
+        super().__init__(pattern, start_size, end_size)
 
-            return ret
+    def __iter__(self):
+        """Implement iter(self)."""
 
-        raise StopIteration
+        pattern = self.pattern
+        for size in range(self.start_size, self.end_size + 1):
+            # Every payload starts at the beginning of the pattern, cycled in C up to its size.
+            yield bytes(itertools.islice(itertools.cycle(pattern), size))
@@ -0,0 +1,111 @@
+#  #!/usr/bin/env python
+#  encoding: utf-8
+#
+#  --------------------------------------------------------------------------------------------------------------------
+#
+#  Name: test_executor.py
+#  Version: 0.0.1
+#  Summary: Marvin a Pinpoint Network Problems
+#           Visualize network performance data across hundreds of targets with tools built for monitoring both
+#           local and remote devices, helping you find and fix problems fast.
+#
+#  Author: Alexsander Lopes Camargos
+#  Author-email: alcamargos@vivaldi.net
+#
+#  License: MIT
+#
+#  --------------------------------------------------------------------------------------------------------------------
+
+"""Regression tests for the success and failure counters of ResponseList."""
+
+import unittest
+
+from executor import Message
+from executor import Response
+from executor import ResponseList
+
+from models import ICMPPacket
+from models import Types
+
+from utils import SuccessRequest
+
+
+def reply():
+    """Returns a successful Echo Reply response."""
+
+    return Response(Message('', ICMPPacket(Types.EchoReply, b'x'), '127.0.0.1', 9), 0.001)
+
+
+def unreachable():
+    """Returns a Destination Unreachable response, a failure that did get an answer."""
+
+    return Response(Message('', ICMPPacket(Types.DestinationUnreachable, b'x'), '127.0.0.1', 9), 0.001)
+
+
+def timed_out():
+    """Returns a response that never arrived."""
+
+    return Response(None, 1)
+
+
+class ResponseListTest(unittest.TestCase):
+    def test_success_request_values(self):
+        self.assertEqual((SuccessRequest.one, SuccessRequest.most, SuccessRequest.all), (1, 2, 4))
+
+    def test_counters_with_mixed_responses(self):
+        responses = ResponseList([reply(), unreachable(), timed_out(), reply()])
+
+        self.assertEqual(len(responses), 4)
+        self.assertEqual(responses.packets_lost, 2)
+
+    def test_success_with_mixed_responses(self):
+        responses = ResponseList([reply(), unreachable(), timed_out()])
+
+        self.assertTrue(responses.success(SuccessRequest.one))
+        self.assertFalse(responses.success(SuccessRequest.most))
+        self.assertFalse(responses.success(SuccessRequest.all))
+
+    def test_success_with_most_responses(self):
+        responses = ResponseList([reply(), reply(), timed_out()])
+
+        self.assertTrue(responses.success(SuccessRequest.one))
+        self.assertTrue(responses.success(SuccessRequest.most))
+        self.assertFalse(responses.success(SuccessRequest.all))
+
+    def test_success_with_every_response(self):
+        responses = ResponseList([reply(), reply()])
+
+        self.assertEqual(responses.packets_lost, 0)
+        for option in SuccessRequest:
+            self.assertTrue(responses.success(option))
+
+    def test_success_without_any_reply(self):
+        responses = ResponseList([timed_out(), unreachable()])
+
+        self.assertEqual(responses.packets_lost, 2)
+        for option in SuccessRequest:
+            self.assertFalse(responses.success(option))
+
+    def test_success_when_empty(self):
+        responses = ResponseList()
+
+        self.assertFalse(responses.success(SuccessRequest.one))
+        self.assertFalse(responses.success(SuccessRequest.most))
+        # Nothing failed, so every request trivially succeeded.
+        self.assertTrue(responses.success(SuccessRequest.all))
+
+    def test_clear_responses_resets_counters(self):
+        responses = ResponseList([reply(), timed_out()])
+        responses.clear_responses()
+
+        self.assertEqual(len(responses), 0)
+        self.assertEqual(responses.packets_lost, 0)
+        self.assertFalse(responses.success(SuccessRequest.one))
+
+        responses.append(timed_out())
+        self.assertEqual(responses.packets_lost, 1)
+        self.assertFalse(responses.success(SuccessRequest.one))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,159 @@
+#  #!/usr/bin/env python
+#  encoding: utf-8
+#
+#  --------------------------------------------------------------------------------------------------------------------
+#
+#  Name: test_models.py
+#  Version: 0.0.1
+#  Summary: Marvin a Pinpoint Network Problems
+#           Visualize network performance data across hundreds of targets with tools built for monitoring both
+#           local and remote devices, helping you find and fix problems fast.
+#
+#  Author: Alexsander Lopes Camargos
+#  Author-email: alcamargos@vivaldi.net
+#
+#  License: MIT
+#
+#  --------------------------------------------------------------------------------------------------------------------
+
+"""Regression tests for packing and parsing ICMPPacket packets."""
+
+import random
+import socket
+import unittest
+
+from unittest import mock
+
+from executor import Communicator
+
+from models import ICMP_HEADER_LENGTH
+from models import ICMPPacket
+from models import Types
+from models import TypesV6
+from models import build_echo_request
+from models import parse_icmp
+
+from utils import ones_complement_sum
+
+# Sequence numbers around the edges of the 16 bits field, where the carries happen.
+EDGE_SEQUENCE_NUMBERS = (0, 1, 0x7FFF, 0x8000, 0xFFFE, 0xFFFF)
+
+
+class _RecordingSocket:
+    """Stands in for SocketInterface, keeping the packets sent and never receiving any."""
+
+    family = socket.AF_INET
+    destination = '127.0.0.1'
+
+    def __init__(self, *args, **kwargs):
+        self.sent = []
+
+    def send_packet(self, packet):
+        self.sent.append(bytes(packet))
+
+    def receive_packet(self, timeout=2):
+        return b'', '', 0
+
+
+class IncrementalChecksumTest(unittest.TestCase):
+    def setUp(self):
+        # Fixed seed, so a failure can be reproduced.
+        self.random = random.Random(1624)
+
+    def random_payload(self):
+        """Returns a random payload, of odd length as often as of even length."""
+
+        return self.random.randbytes(self.random.randrange(0, 65))
+
+    def test_update_sequence_number_matches_full_rebuild(self):
+        for _ in range(2000):
+            identifier = self.random.randrange(0x10000)
+            old_sequence = self.random.choice((self.random.randrange(0x10000),) + EDGE_SEQUENCE_NUMBERS)
+            new_sequence = self.random.choice((self.random.randrange(0x10000),) + EDGE_SEQUENCE_NUMBERS)
+            payload = self.random_payload()
+
+            raw = build_echo_request(identifier, old_sequence, payload)
+            ICMPPacket.update_sequence_number(raw, new_sequence)
+
+            expected = build_echo_request(identifier, new_sequence, payload)
+
+            self.assertEqual(raw.tobytes(), expected.tobytes())
+            self.assertEqual(ones_complement_sum(raw), 0xFFFF)
+
+    def test_update_sequence_number_in_reused_buffer(self):
+        payload = self.random_payload()
+        raw = build_echo_request(0x1234, 1, payload)
+
+        for sequence in range(2, 2000):
+            ICMPPacket.update_sequence_number(raw, sequence)
+
+            self.assertEqual(raw.tobytes(), build_echo_request(0x1234, sequence, payload).tobytes())
+
+    def test_payload_sum_matches_full_checksum(self):
+        for _ in range(2000):
+            identifier = self.random.randrange(0x10000)
+            sequence = self.random.randrange(0x10000)
+            payload = self.random_payload()
+
+            raw = build_echo_request(identifier, sequence, payload, payload_sum=ones_complement_sum(payload))
+
+            self.assertEqual(raw.tobytes(), build_echo_request(identifier, sequence, payload).tobytes())
+
+    def test_reused_mutable_payload_is_packed_again(self):
+        def reused_buffer():
+            buffer = bytearray(4)
+            for pattern in (b'AAAA', b'BBBB', b'CCCC'):
+                buffer[:] = pattern
+                yield buffer
+
+        with mock.patch('executor.SocketInterface', _RecordingSocket):
+            communicator = Communicator('127.0.0.1', reused_buffer(), 0.01)
+            communicator.run()
+
+        sent = communicator.socket.sent
+        self.assertEqual([packet[ICMP_HEADER_LENGTH:] for packet in sent], [b'AAAA', b'BBBB', b'CCCC'])
+        for packet in sent:
+            self.assertEqual(ones_complement_sum(packet), 0xFFFF)
+
+
+class ParseTest(unittest.TestCase):
+    # IPv4 header with IHL 6, so 4 bytes of options (no-operation padding) come before the ICMPPacket.
+    IPV4_HEADER_WITH_OPTIONS = bytes((0x46, 0, 0, 40, 0, 0, 0, 0, 64, 1, 0, 0, 127, 0, 0, 1, 127, 0, 0, 1, 1, 1, 1, 0))
+
+    def test_ip_header_length_reads_ihl(self):
+        self.assertEqual(ICMPPacket.ip_header_length(b'\x45' + bytes(19)), 20)
+        self.assertEqual(ICMPPacket.ip_header_length(self.IPV4_HEADER_WITH_OPTIONS), 24)
+
+    def test_ip_header_length_is_zero_for_ipv6(self):
+        self.assertEqual(ICMPPacket.ip_header_length(self.IPV4_HEADER_WITH_OPTIONS, socket.AF_INET6), 0)
+
+    def test_parse_ipv4_with_options(self):
+        icmp = build_echo_request(0xBEEF, 0x8001, b'payload').tobytes()
+
+        message_type, message_code, checksum, identifier, sequence_number, payload = \
+            parse_icmp(self.IPV4_HEADER_WITH_OPTIONS + icmp)
+
+        self.assertEqual(message_type, Types.EchoRequest.type_id)
+        self.assertEqual(message_code, 0)
+        self.assertEqual(checksum, int.from_bytes(icmp[2:4], 'big'))
+        self.assertEqual(identifier, 0xBEEF)
+        self.assertEqual(sequence_number, 0x8001)
+        self.assertEqual(payload, b'payload')
+
+        packet = ICMPPacket.generate_from_raw(self.IPV4_HEADER_WITH_OPTIONS + icmp)
+        self.assertTrue(packet.is_valid)
+
+    def test_parse_ipv6_without_header(self):
+        icmp = build_echo_request(0xBEEF, 7, b'payload', family=socket.AF_INET6).tobytes()
+
+        packet = ICMPPacket.generate_from_raw(icmp, socket.AF_INET6)
+
+        self.assertEqual(packet.message_type, TypesV6.EchoRequest.type_id)
+        self.assertEqual(packet.identifier, 0xBEEF)
+        self.assertEqual(packet.sequence_number, 7)
+        self.assertEqual(packet.payload, b'payload')
+        self.assertEqual(packet.family, socket.AF_INET6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -19,45 +19,112 @@
 """Some useful classes and functions for code reuse."""
 
 import enum
+import struct
 
-from random import choice
+from array import array
+from random import choices
 from string import printable as printable_character
+from typing import Final
 
+# The printable characters as a tuple of existing one-character strings, so sampling does not create new ones.
+_printable_characters = tuple(printable_character)
 
-class SuccessRequest(enum.IntEnum):
-    # Automatically assign the integer value to the values of enum class attributes.
+# The printable characters as a bytes population, sampled as integers.
+_printable_bytes = printable_character.encode('ascii')
+
+
+class SuccessRequest(enum.IntFlag):
+    # Automatically assign the integer value, a distinct bit, to the values of enum class attributes.
     one = enum.auto()
     most = enum.auto()
     all = enum.auto()
 
 
 class SeedIds:
+    __slots__ = ('__ids', '__index')
+
     def __init__(self, ids=None):
         # Preventing the default argument value of ids is changeable.
         if ids is None:
-            ids = []
+            ids = ()
+
+        # Identifiers are 16 bits, kept unboxed, with a set alongside for membership tests.
+        self.__ids = array('H', ids)
+        self.__index = set(self.__ids)
+
+    def __contains__(self, seed_id):
+        """Return seed_id in self."""
+
+        return seed_id in self.__index
 
-        self.__ids = ids
+    def __len__(self):
+        """Return len(self)."""
+
+        return len(self.__ids)
+
+    def add(self, seed_id):
+        """Marks the identifier as in use."""
+
+        if seed_id not in self.__index:
+            self.__ids.append(seed_id)
+            self.__index.add(seed_id)
+
+    def discard(self, seed_id):
+        """Releases the identifier, if it is in use."""
+
+        if seed_id in self.__index:
+            self.__ids.remove(seed_id)
+            self.__index.discard(seed_id)
 
     @property
     def ids(self):
-        return self.__ids
+        """Read-only view of the identifiers in use."""
+
+        return memoryview(self.__ids).toreadonly()
 
 
-class ICMPData(enum.Enum):
-    # Default ICMPPacket header.
-    ICMP_STRUCTURE_FMT = 'bbHHh'
-    # Ethernet, IP and ICMPPacket header lengths combined
-    LEN_TO_PAYLOAD = 41
+# Default ICMPPacket header, in network byte order.
+ICMP_STRUCTURE_FMT: Final[str] = '!BBHHH'
+
+# Ethernet, IP and ICMPPacket header lengths combined
+LEN_TO_PAYLOAD: Final[int] = 41
+
+# Default ICMPPacket header, compiled once for every pack and unpack.
+ICMP_STRUCT: Final[struct.Struct] = struct.Struct(ICMP_STRUCTURE_FMT)
+
+
+def ones_complement_sum(data, start=0):
+    """Returns the 1's complement sum of the data in 16-bits big-endian chunks, as in RFC 1071, added to start.
+
+    Odd length data is padded with one empty byte."""
+
+    if len(data) % 2:
+        data = bytes(data) + b'\x00'
+
+    # Sum 16 bits chunks together in a single C call.
+    amount = start + sum(struct.unpack(f'>{len(data) // 2}H', data))
+
+    # Add carry on the right until fits in 16 bits.
+    while amount >> 16:
+        amount = (amount & 0xFFFF) + (amount >> 16)
+
+    return amount
 
 
 def random_text(size):
     """Returns a random text of the specified size."""
 
-    return ''.join(choice(printable_character) for _ in range(size))
+    return ''.join(choices(_printable_characters, k=size))
+
+
+def random_bytes(size):
+    """Returns random printable bytes of the specified size, ready to be used as a payload."""
+
+    return bytes(choices(_printable_bytes, k=size))
 
 
 def represent_seconds_in_milliseconds(seconds):
     """Converts seconds into human-readable milliseconds with 2 digits decimal precision"""
 
-    return round(seconds * 1000, 2)
+    # Round half up in hundredths of millisecond, round trip times are never negative.
+    return int(seconds * 100000.0 + 0.5) / 100.0